@@ -4,38 +4,201 @@ import sys
 import time
 import socket
 import imaplib
-import ssl
-import traceback
-from typing import List, Optional, Tuple, Type, TypeVar
+import queue
+import threading
+from collections import deque
+from contextlib import suppress
+from concurrent.futures import ThreadPoolExecutor
+from typing import ClassVar, Deque, List, Optional, Set, Tuple, Type, TypeVar
 from datetime import datetime
 from loguru import logger
 from dotenv import load_dotenv
-from imap_tools import MailBox, AND, A, MailboxLoginError, MailboxLogoutError, MailMessage
+from imap_tools import (
+    MailBox, AND, A, MailboxLoginError, MailboxLogoutError, MailMessage,
+    MailboxFetchError, MailboxFlagError,
+)
+
+# Environment is read once per process, not per client instance
+load_dotenv()
+IMAP_SERVER: str = os.getenv('IMAP_SERVER', 'imap.tma.com.vn')
+EMAIL_USERNAME: Optional[str] = os.getenv('EMAIL_USERNAME')
+EMAIL_PASSWORD: Optional[str] = os.getenv('EMAIL_PASSWORD')
+EMAIL_FOLDER: str = os.getenv('EMAIL_FOLDER', 'INBOX')
+
+# Log through a queued sink so formatting and stderr writes happen off the IDLE thread
+logger.remove()
+logger.add(sys.stderr, level=os.getenv('LOG_LEVEL', 'INFO'), enqueue=True, backtrace=False, diagnose=False)
 
 # Type aliases
 Seconds = float
 ExceptionType = Type[BaseException]
 
+# Maximum number of fetched messages waiting to be processed
+MESSAGE_QUEUE_SIZE = 256
+
+# Number of recently processed UIDs remembered to skip re-delivered messages
+SEEN_UIDS_MAX = 4096
+
+# Unread backlog fetch: extra connections opened in parallel, and messages per shard/FETCH
+BACKLOG_MAX_CONNECTIONS = 4
+BACKLOG_SHARD_SIZE = 50
+
+# Socket timeout for the extra backlog connections so a stalled one falls back instead of blocking startup
+# (seconds; imaplib only accepts a timeout since Python 3.9)
+BACKLOG_CONNECTION_TIMEOUT: Optional[Seconds] = 30 if sys.version_info >= (3, 9) else None
+
+# Connection reuse: IDLE re-issue / NOOP liveness probe interval (rfc2177) and reconnect backoff bounds (seconds)
+IDLE_RENEW_INTERVAL: Seconds = 24 * 60
+RECONNECT_BASE_DELAY: Seconds = 1
+RECONNECT_MAX_DELAY: Seconds = 60
+
+# Longest a single socket poll may block before a stop request is checked (seconds)
+STOP_CHECK_INTERVAL: Seconds = 1
+
+# Adaptive IDLE timeout: about three mean inter-arrival times, clamped to these bounds (seconds)
+MIN_IDLE_TIMEOUT: Seconds = 5
+MAX_IDLE_TIMEOUT: Seconds = 29 * 60
+DEFAULT_IDLE_TIMEOUT: Seconds = 45
+INTER_ARRIVAL_EWMA_WEIGHT = 0.3
+
+# Numeric value of the INFO level, used to skip message formatting when INFO is filtered out
+INFO_LEVEL_NO = logger.level("INFO").no
+
+
+def build_uid_set(uids: List[str]) -> str:
+    """Build an IMAP UID set, collapsing consecutive UIDs into ranges.
+    
+    Args:
+        uids: Message UIDs, e.g. ['1', '3', '7', '8', '9']
+        
+    Returns:
+        The UID set string, e.g. '1,3,7:9'
+    """
+    ordered = sorted(map(int, uids))
+    buf = bytearray()
+    i, n = 0, len(ordered)
+    while i < n:
+        # Extend the run while UIDs are consecutive
+        j = i
+        while j + 1 < n and ordered[j + 1] == ordered[j] + 1:
+            j += 1
+        if buf:
+            buf += b','
+        buf += b'%d' % ordered[i]
+        if j > i:
+            buf += b':%d' % ordered[j]
+        i = j + 1
+    return buf.decode('ascii')
+
+
+def info_logging_enabled() -> bool:
+    """Check whether any log sink accepts INFO records.
+    
+    Returns:
+        True if INFO messages would be emitted
+    """
+    return logger._core.min_level <= INFO_LEVEL_NO
+
 
 class IMAPIdleClient:
     """IMAP IDLE client with reconnection support and type hints."""
-    def __init__(self) -> None:
-        """Initialize the IMAP IDLE client with configuration from environment variables."""
-        load_dotenv()
+    
+    # Search query for unseen messages, built once and shared by all lookups
+    _UNSEEN_Q: ClassVar[AND] = A(seen=False)
+    
+    __slots__ = (
+        'imap_server', 'username', 'password', 'folder',
+        '_queue', '_worker_thread', '_seen_uids', '_seen_order', '_mailbox',
+        '_last_arrival_time', '_inter_arrival_ewma', '_stop_event',
+        '_unseen_left_behind',
+    )
+    
+    def __init__(self, folder: Optional[str] = None) -> None:
+        """Initialize the IMAP IDLE client with configuration from environment variables.
         
+        Args:
+            folder: Folder to watch, defaults to the EMAIL_FOLDER environment variable
+        """
         # Configuration with type hints
-        self.imap_server: str = os.getenv('IMAP_SERVER', 'imap.tma.com.vn')
-        self.username: Optional[str] = os.getenv('EMAIL_USERNAME')
-        self.password: Optional[str] = os.getenv('EMAIL_PASSWORD')
-        self.folder: str = os.getenv('EMAIL_FOLDER', 'INBOX')
-        self.ssl_context: ssl.SSLContext = ssl.create_default_context()
-        
-        # Disable SSL verification (use only for testing with self-signed certificates)
-        self.ssl_context.check_hostname = False
-        self.ssl_context.verify_mode = ssl.CERT_NONE
+        self.imap_server: str = IMAP_SERVER
+        self.username: Optional[str] = EMAIL_USERNAME
+        self.password: Optional[str] = EMAIL_PASSWORD
+        self.folder: str = folder or EMAIL_FOLDER
         
         if not all([self.username, self.password]):
             raise ValueError("Please set EMAIL_USERNAME and EMAIL_PASSWORD in .env file")
+        
+        # Fetched messages are processed on a worker thread so IDLE can resume immediately
+        self._queue: queue.Queue[Optional[MailMessage]] = queue.Queue(maxsize=MESSAGE_QUEUE_SIZE)
+        self._worker_thread: Optional[threading.Thread] = None
+        
+        # Recently processed UIDs (set for lookups, deque for FIFO eviction), only touched by the worker
+        self._seen_uids: Set[int] = set()
+        self._seen_order: Deque[int] = deque(maxlen=SEEN_UIDS_MAX)
+        
+        # Authenticated mailbox, kept open across transient IDLE errors
+        self._mailbox: Optional[MailBox] = None
+        
+        # Mail arrival statistics driving the adaptive IDLE timeout; the quiet spell is
+        # measured from client start until the first mail arrives
+        self._last_arrival_time: float = time.monotonic()
+        self._inter_arrival_ewma: Seconds = DEFAULT_IDLE_TIMEOUT / 3
+        
+        # Unseen messages that did not fit in the queue on the last fetch and must be retried
+        self._unseen_left_behind = False
+        
+        # Set by stop() to end run() from another thread
+        self._stop_event = threading.Event()
+    
+    def stop(self) -> None:
+        """Ask run() to leave IDLE, log out and drain the worker, from any thread."""
+        self._stop_event.set()
+    
+    @property
+    def idle_timeout(self) -> Seconds:
+        """IDLE wait timeout adapted to how often mail arrives."""
+        # A long quiet spell since the last arrival counts too, so the timeout grows back after a burst
+        inter_arrival = max(self._inter_arrival_ewma, time.monotonic() - self._last_arrival_time)
+        return min(MAX_IDLE_TIMEOUT, max(MIN_IDLE_TIMEOUT, 3 * inter_arrival))
+    
+    def _record_arrival(self) -> None:
+        """Update the inter-arrival EWMA with the time since the previous new mail."""
+        now = time.monotonic()
+        inter_arrival = now - self._last_arrival_time
+        self._inter_arrival_ewma += INTER_ARRIVAL_EWMA_WEIGHT * (inter_arrival - self._inter_arrival_ewma)
+        self._last_arrival_time = now
+    
+    def _worker(self) -> None:
+        """Process queued messages until the ``None`` sentinel is received."""
+        while True:
+            msg = self._queue.get()
+            if msg is None:
+                break
+            # Keep the worker alive whatever a single message does
+            try:
+                self.process_message(msg)
+            except Exception as e:
+                logger.error("Error in message worker: {}", e)
+                logger.opt(exception=True).debug("Error in message worker")
+    
+    def _enqueue_message(self, msg: MailMessage) -> bool:
+        """Hand a fetched message over to the worker thread.
+        
+        Messages are dropped with a warning when the queue is full so the IDLE
+        loop never blocks on processing.
+        
+        Args:
+            msg: The email message to process
+            
+        Returns:
+            True if the message was queued, False if it was dropped
+        """
+        try:
+            self._queue.put_nowait(msg)
+        except queue.Full:
+            logger.warning("Message queue full, leaving message UID {} unseen for a later fetch", msg.uid)
+            return False
+        return True
     
     def process_message(self, msg: MailMessage) -> None:
         """Process a new email message.
@@ -43,16 +206,31 @@ class IMAPIdleClient:
         Args:
             msg: The email message to process
         """
+        # Skip messages already processed before a reconnect re-delivered them
+        if msg.uid:
+            uid = int(msg.uid)
+            if uid in self._seen_uids:
+                logger.debug("Skipping already processed message UID {}", uid)
+                return
+            if len(self._seen_order) == self._seen_order.maxlen:
+                self._seen_uids.discard(self._seen_order[0])
+            self._seen_order.append(uid)
+            self._seen_uids.add(uid)
+        
+        # Nothing below is logged unless some sink accepts INFO records
+        if not info_logging_enabled():
+            return
+        
         try:
             logger.info("\n" + "="*60)
-            logger.info(f"NEW EMAIL RECEIVED - {datetime.now()}")
+            logger.info("NEW EMAIL RECEIVED - {}", datetime.now())
             logger.info("="*60)
             
             # Basic email information
-            logger.info(f"From: {msg.from_}")
-            logger.info(f"To: {msg.to}")
-            logger.info(f"Date: {msg.date}")
-            logger.info(f"Subject: {msg.subject}")
+            logger.info("From: {}", msg.from_)
+            logger.info("To: {}", msg.to)
+            logger.info("Date: {}", msg.date)
+            logger.info("Subject: {}", msg.subject)
             
             # Print text content
             if msg.text:
@@ -62,36 +240,19 @@ class IMAPIdleClient:
             # Print HTML content if no text content
             elif msg.html:
                 logger.info("\n--- HTML CONTENT (first 500 chars) ---")
-                logger.info(msg.html[:500] + (msg.html[500:] and '...'))
+                logger.info(msg.html[:500] + ('...' if len(msg.html) > 500 else ''))
             
             # Print attachments info
             if msg.attachments:
                 logger.info("\n--- ATTACHMENTS ---")
                 for att in msg.attachments:
-                    logger.info(f"- {att.filename} ({len(att.payload)} bytes)")
+                    logger.info("- {} ({} bytes)", att.filename, len(att.payload))
             
             logger.info("="*60 + "\n")
             
         except Exception as e:
-            logger.error(f"Error processing message: {e}")
-            logger.debug(traceback.format_exc())
-    
-    def idle_callback(self, mailbox: MailBox) -> None:
-        """Process new messages in IDLE mode.
-        
-        Args:
-            mailbox: The connected mailbox instance
-            
-        Raises:
-            Exception: If there's an error processing messages
-        """
-        try:
-            for msg in mailbox.fetch(AND(seen=False), mark_seen=True):
-                self.process_message(msg)
-        except Exception as e:
-            logger.error(f"Error in idle callback: {e}")
-            logger.debug(traceback.format_exc())
-            raise
+            logger.error("Error processing message: {}", e)
+            logger.opt(exception=True).debug("Error processing message")
     
     def _handle_initial_connection(self, mailbox: MailBox) -> None:
         """Handle initial connection setup and authentication.
@@ -107,14 +268,82 @@ class IMAPIdleClient:
             
         logger.info("Authenticating...")
         mailbox.login(self.username, self.password, self.folder)
-        logger.info(f"Successfully logged in to {self.folder}")
+        logger.info("Successfully logged in to {}", self.folder)
         
-        # Get initial message count
+        # Drain the unread backlog into the processing queue
         try:
-            messages = list(mailbox.fetch(AND(seen=False)))
-            logger.info(f"Found {len(messages)} unread messages")
+            uids = mailbox.uids(self._UNSEEN_Q)
+            logger.info("Found {} unread messages", len(uids))
+            for msg in self._fetch_backlog(mailbox, uids):
+                self._queue.put(msg)
         except Exception as e:
-            logger.warning(f"Could not fetch initial messages: {e}")
+            logger.warning("Could not fetch initial messages: {}", e)
+    
+    @staticmethod
+    def _fetch_uids(mailbox: MailBox, uids: List[str]) -> List[MailMessage]:
+        """Fetch and mark seen the given messages, headers only when bodies would not be logged.
+        
+        Args:
+            mailbox: The connected mailbox instance
+            uids: UIDs of the messages to fetch
+            
+        Returns:
+            The fetched messages
+        """
+        headers_only = not info_logging_enabled()
+        criteria = A(uid=build_uid_set(uids))
+        return list(mailbox.fetch(criteria, mark_seen=True, headers_only=headers_only, bulk=BACKLOG_SHARD_SIZE))
+    
+    def _fetch_shard(self, uids: List[str]) -> List[MailMessage]:
+        """Fetch a shard of the unread backlog on a dedicated connection.
+        
+        Args:
+            uids: UIDs of the messages to fetch
+            
+        Returns:
+            The fetched messages
+            
+        Raises:
+            Exception: If the extra connection or the fetch fails
+        """
+        with MailBox(self.imap_server, timeout=BACKLOG_CONNECTION_TIMEOUT) as mailbox:
+            mailbox.login(self.username, self.password, self.folder)
+            return self._fetch_uids(mailbox, uids)
+    
+    def _fetch_backlog(self, mailbox: MailBox, uids: List[str]) -> List[MailMessage]:
+        """Fetch the unread backlog, spreading large backlogs over several connections.
+        
+        Args:
+            mailbox: The connected mailbox instance
+            uids: UIDs of the unread messages
+            
+        Returns:
+            The fetched messages
+        """
+        shard_count = min(BACKLOG_MAX_CONNECTIONS, len(uids) // BACKLOG_SHARD_SIZE + 1)
+        if shard_count <= 1:
+            return self._fetch_uids(mailbox, uids) if uids else []
+        
+        shard_size = -(-len(uids) // shard_count)
+        shards = [uids[i:i + shard_size] for i in range(0, len(uids), shard_size)]
+        with ThreadPoolExecutor(max_workers=len(shards), thread_name_prefix="imap-backlog") as executor:
+            futures = [executor.submit(self._fetch_shard, shard) for shard in shards]
+        
+        messages: List[MailMessage] = []
+        for shard, future in zip(shards, futures):
+            try:
+                messages.extend(future.result())
+                continue
+            except Exception as e:
+                # Connection limit, refused connection, timeout...: fall back to the main connection
+                logger.warning("Extra connection failed ({}), fetching {} messages on the main connection", e, len(shard))
+            try:
+                messages.extend(self._fetch_uids(mailbox, shard))
+            except Exception as e:
+                # Keep what the other shards already fetched (and marked seen)
+                logger.error("Could not fetch {} backlog messages: {}", len(shard), e)
+                logger.opt(exception=True).debug("Could not fetch backlog messages")
+        return messages
     
     def _run_idle_loop(self, mailbox: MailBox) -> None:
         """Run the IDLE loop to listen for new messages.
@@ -122,131 +351,328 @@ class IMAPIdleClient:
         Args:
             mailbox: The connected mailbox instance
             
+        Returns when the user interrupts the process or stop() is called.
+        
         Raises:
-            KeyboardInterrupt: When user interrupts the process
             ConnectionError: When connection is lost
         """
         logger.info("\nStarting IDLE mode. Press Ctrl+C to exit...")
         logger.info("Waiting for new emails...")
         
+        # IDLE stays active across polls and is only left to fetch mail or to renew it
+        mailbox.idle.start()
+        idling = True
+        idle_start_time = time.monotonic()
+        
         try:
-            while True:
+            while not self._stop_event.is_set():
                 try:
-                    # Wait for notifications with a timeout
-                    responses = mailbox.idle.wait(timeout=45)  # 45 seconds
-                    logger.debug(f"IDLE responses: {responses}")
+                    # Wait for untagged responses, longer on quiet mailboxes and shorter on busy ones,
+                    # but never past the point where IDLE has to be renewed
+                    idle_timeout = self.idle_timeout
+                    if self._unseen_left_behind:
+                        # Come back soon for messages the queue could not take last time
+                        idle_timeout = MIN_IDLE_TIMEOUT
+                    renew_interval = min(IDLE_RENEW_INTERVAL, 8 * idle_timeout)
+                    poll_start_time = time.monotonic()
+                    poll_timeout = max(0.0, min(idle_timeout, renew_interval - (poll_start_time - idle_start_time)))
+                    responses = self._poll_idle(mailbox, poll_timeout)
+                    logger.debug("IDLE responses: {}", responses)
+                    if self._stop_event.is_set():
+                        break
+                    
+                    if any(line.startswith(b'* BYE') for line in responses):
+                        raise ConnectionError("Server closed the connection")
                     
-                    if responses:
+                    new_mail = any(b'EXISTS' in line or b'RECENT' in line for line in responses)
+                    woke_early = not responses and time.monotonic() - poll_start_time < poll_timeout
+                    if new_mail:
+                        self._record_arrival()
+                    
+                    if new_mail or (self._unseen_left_behind and not responses and not woke_early):
+                        mailbox.idle.stop()
+                        idling = False
                         self.idle_callback(mailbox)
                     else:
-                        logger.info("No new emails in the last 45 seconds")
+                        if not responses:
+                            logger.info("No new emails in the last {:.0f} seconds", poll_timeout)
+                        
+                        # Renew IDLE before the server drops it, or when the socket woke up with
+                        # nothing to read; either way a NOOP probe checks the connection
+                        if not woke_early and time.monotonic() - idle_start_time < renew_interval:
+                            continue
+                        mailbox.idle.stop()
+                        idling = False
+                        mailbox = self._ensure_connected()
+                    
+                    mailbox.idle.start()
+                    idling = True
+                    idle_start_time = time.monotonic()
                     
                 except (ConnectionError, imaplib.IMAP4.abort) as e:
-                    logger.error(f"Connection error: {e}")
-                    logger.debug(traceback.format_exc())
+                    logger.error("Connection error: {}", e)
+                    logger.opt(exception=True).debug("Connection error")
                     raise ConnectionError("Connection lost") from e
                     
                 except Exception as e:
-                    logger.error(f"Unexpected error in IDLE loop: {e}")
-                    logger.debug(traceback.format_exc())
+                    logger.error("Unexpected error in IDLE loop: {}", e)
+                    logger.opt(exception=True).debug("Unexpected error in IDLE loop")
                     time.sleep(1)  # Prevent tight loop on errors
+                    if idling:
+                        with suppress(Exception):
+                            mailbox.idle.stop()
+                        idling = False
+                    mailbox = self._ensure_connected()
+                    mailbox.idle.start()
+                    idling = True
+                    idle_start_time = time.monotonic()
         
         except KeyboardInterrupt:
-            logger.info("\nExiting IDLE mode...")
+            pass
         except Exception as e:
-            logger.error(f"Error in IDLE loop: {e}")
-            logger.debug(traceback.format_exc())
+            logger.error("Error in IDLE loop: {}", e)
+            logger.opt(exception=True).debug("Error in IDLE loop")
             raise
+        
+        logger.info("\nExiting IDLE mode...")
+        if idling:
+            with suppress(Exception):
+                mailbox.idle.stop()
+    
+    def _poll_idle(self, mailbox: MailBox, timeout: Seconds) -> List[bytes]:
+        """Poll for IDLE responses in short slices so a stop request is noticed promptly.
+        
+        Args:
+            mailbox: The connected mailbox instance in IDLE mode
+            timeout: Total time to wait for responses
+            
+        Returns:
+            The raw IDLE responses, empty on timeout, stop, or a wake-up with nothing to read
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = max(0.0, deadline - time.monotonic())
+            slice_timeout = min(remaining, STOP_CHECK_INTERVAL)
+            slice_start_time = time.monotonic()
+            responses = mailbox.idle.poll(timeout=slice_timeout)
+            if responses or self._stop_event.is_set() or remaining <= STOP_CHECK_INTERVAL:
+                return responses
+            if time.monotonic() - slice_start_time < slice_timeout:
+                # Socket became readable without a full response; let the caller probe it
+                return responses
     
     def idle_callback(self, mailbox: MailBox) -> None:
         """Process new messages in IDLE mode.
         
         Args:
             mailbox: The connected mailbox instance
+            
+        Raises:
+            Exception: If there's an error fetching messages
         """
         try:
-            # Fetch only unseen messages
-            for msg in mailbox.fetch(A(seen=False), mark_seen=True):
-                self.process_message(msg)
+            # Fetch unseen messages with a single UID FETCH instead of one per message, but only
+            # as many as the queue can take; the rest stay unseen and are retried on a later poll
+            unseen_uids = mailbox.uids(self._UNSEEN_Q)
+            free_slots = MESSAGE_QUEUE_SIZE - self._queue.qsize()
+            uids = sorted(unseen_uids, key=int)[:max(0, free_slots)]
+            self._unseen_left_behind = len(uids) < len(unseen_uids)
+            if self._unseen_left_behind:
+                logger.warning("Message queue full, {} unseen messages left for a later fetch",
+                               len(unseen_uids) - len(uids))
+            if not uids:
+                return
+            uid_set = build_uid_set(uids)
+            
+            # Full bodies are only needed when process_message will log them
+            body_section = 'BODY.PEEK[]' if info_logging_enabled() else 'BODY.PEEK[HEADER]'
+            fetch_result = mailbox.client.uid('FETCH', uid_set, f'({body_section} UID FLAGS)')
+            if fetch_result[0] != 'OK':
+                raise MailboxFetchError(fetch_result, 'OK')
+            # Each message is a (header, literal) tuple followed by a bytes item that may carry
+            # UID/FLAGS (MS Exchange puts them there), so keep them together like imap_tools does
+            fetch_items: List[list] = []
+            for item in fetch_result[1]:
+                if isinstance(item, tuple):
+                    fetch_items.append([item])
+                elif item and fetch_items:
+                    fetch_items[-1].append(item)
+            messages = [MailMessage(items) for items in fetch_items]
+            
+            # Mark only the queued messages as seen, with one UID STORE; dropped ones stay
+            # unseen so a later poll fetches them again
+            queued_uids = [msg.uid for msg in messages if self._enqueue_message(msg) and msg.uid]
+            if len(queued_uids) < len(messages):
+                self._unseen_left_behind = True
+            if not queued_uids:
+                return
+            store_result = mailbox.client.uid('STORE', build_uid_set(queued_uids), '+FLAGS', r'(\Seen)')
+            if store_result[0] != 'OK':
+                raise MailboxFlagError(store_result, 'OK')
         except Exception as e:
-            logger.error(f"Error in idle callback: {e}")
-            logger.debug(traceback.format_exc())
+            logger.error("Error in idle callback: {}", e)
+            logger.opt(exception=True).debug("Error in idle callback")
             raise
     
+    def _connect(self) -> MailBox:
+        """Open and authenticate a new mailbox connection.
+        
+        Returns:
+            The connected mailbox instance
+        """
+        logger.info("Connecting to {}...", self.imap_server)
+        mailbox = MailBox(self.imap_server)
+        try:
+            logger.debug("Capabilities: {}", mailbox.client.capabilities)
+            self._handle_initial_connection(mailbox)
+        except Exception:
+            with suppress(Exception):
+                mailbox.logout()
+            raise
+        logger.info("Connection established")
+        self._mailbox = mailbox
+        return mailbox
+    
+    def _disconnect(self) -> None:
+        """Log out of the current mailbox connection, if any."""
+        if self._mailbox is None:
+            return
+        with suppress(Exception):
+            self._mailbox.logout()
+        self._mailbox = None
+    
+    def _ensure_connected(self) -> MailBox:
+        """Return a live mailbox, reconnecting only if a NOOP probe fails.
+        
+        Returns:
+            The connected mailbox instance
+        """
+        if self._mailbox is not None:
+            try:
+                self._mailbox.client.noop()
+                return self._mailbox
+            except (imaplib.IMAP4.error, OSError) as e:
+                logger.warning("Connection check failed: {}", e)
+                self._disconnect()
+        return self._connect()
+    
+    def _wait_before_reconnect(self, attempt: int) -> None:
+        """Sleep with exponential backoff before the next reconnection attempt.
+        
+        Args:
+            attempt: Number of consecutive failed attempts so far
+        """
+        delay = min(RECONNECT_MAX_DELAY, RECONNECT_BASE_DELAY * 2 ** attempt)
+        logger.info("Reconnecting in {} seconds...", delay)
+        self._stop_event.wait(delay)
+    
     def run(self) -> None:
         """Run the IMAP IDLE client with reconnection support.
         
         This is the main loop that handles connection, reconnection, and error handling.
         Based on the reliable console notifier example from imap-tools documentation.
+        The authenticated connection is reused until it is actually lost.
         """
         done = False
+        attempt = 0
         
-        while not done:
-            connection_start_time = time.monotonic()
-            connection_live_time = 0.0
-            
-            try:
-                logger.info(f"Connecting to {self.imap_server}...")
-                
-                with MailBox(self.imap_server) as mailbox:
-                    print(mailbox.client.capability(), mailbox.client.capabilities)
-                    try:
-                        # Handle initial connection and authentication
-                        self._handle_initial_connection(mailbox)
-                        logger.info("Connection established")
-                        
-                        # Main IDLE loop
-                        while connection_live_time < 29 * 60:  # Reconnect every 29 minutes
-                            try:
-                                # Run IDLE with a 3-minute timeout
-                                self._run_idle_loop(mailbox)
-                                
-                            except KeyboardInterrupt:
-                                logger.info("Shutdown requested by user")
-                                done = True
-                                break
-                                
-                            except Exception as e:
-                                logger.error(f"Error in IDLE loop: {e}")
-                                logger.debug(traceback.format_exc())
-                                break  # Will trigger reconnection
-                            
-                            connection_live_time = time.monotonic() - connection_start_time
-                        
-                        if done:
-                            break
-                            
-                    except (MailboxLoginError, MailboxLogoutError) as e:
-                        logger.error(f"Authentication error: {e}")
-                        logger.debug(traceback.format_exc())
-                        time.sleep(60)  # Wait before retrying
+        self._worker_thread = threading.Thread(target=self._worker, name="imap-message-worker", daemon=True)
+        self._worker_thread.start()
+        
+        # Always log out and drain the worker, even if Ctrl+C lands during a reconnect backoff
+        try:
+            while not done and not self._stop_event.is_set():
+                try:
+                    mailbox = self._ensure_connected()
+                    attempt = 0
                     
-            except (TimeoutError, ConnectionError, 
-                   imaplib.IMAP4.abort, socket.herror, 
-                   socket.gaierror, socket.timeout) as e:
-                logger.error(f"Connection error: {e}")
-                logger.debug(traceback.format_exc())
-                logger.info("Reconnecting in 60 seconds...")
-                time.sleep(60)
-                
-            except Exception as e:
-                logger.critical(f"Unexpected error: {e}")
-                logger.debug(traceback.format_exc())
-                logger.info("Reconnecting in 60 seconds...")
-                time.sleep(60)
+                    # Only returns once the user interrupts IDLE mode or stop() is called
+                    self._run_idle_loop(mailbox)
+                    done = True
+                    
+                except KeyboardInterrupt:
+                    logger.info("Shutdown requested by user")
+                    done = True
+                    
+                except (MailboxLoginError, MailboxLogoutError) as e:
+                    logger.error("Authentication error: {}", e)
+                    logger.opt(exception=True).debug("Authentication error")
+                    self._disconnect()
+                    self._wait_before_reconnect(attempt)
+                    attempt += 1
+                    
+                except (TimeoutError, ConnectionError, 
+                       imaplib.IMAP4.abort, socket.herror, 
+                       socket.gaierror, socket.timeout) as e:
+                    logger.error("Connection error: {}", e)
+                    logger.opt(exception=True).debug("Connection error")
+                    self._disconnect()
+                    self._wait_before_reconnect(attempt)
+                    attempt += 1
+                    
+                except Exception as e:
+                    logger.critical("Unexpected error: {}", e)
+                    logger.opt(exception=True).debug("Unexpected error")
+                    self._disconnect()
+                    self._wait_before_reconnect(attempt)
+                    attempt += 1
         
+        except KeyboardInterrupt:
+            logger.info("Shutdown requested by user")
+        finally:
+            self._disconnect()
+            
+            # Let the worker drain pending messages before stopping
+            self._queue.put(None)
+            self._worker_thread.join()
         logger.info("IMAP client stopped")
 
+def run_concurrently(clients: List[IMAPIdleClient]) -> None:
+    """Run several IMAP IDLE clients at once, one thread per client.
+    
+    Each client keeps its own connection, so IDLE waits and fetches on one
+    folder do not block the others.
+    
+    Args:
+        clients: The clients to run
+    """
+    threads = [
+        threading.Thread(target=client.run, name=f"imap-idle-{client.folder}", daemon=True)
+        for client in clients
+    ]
+    for thread in threads:
+        thread.start()
+    try:
+        for thread in threads:
+            # Join with a timeout so Ctrl+C is still delivered to the main thread
+            while thread.is_alive():
+                thread.join(timeout=1)
+    except KeyboardInterrupt:
+        # Only the main thread sees Ctrl+C: stop every client and wait for it to log out and drain
+        logger.info("Shutdown requested by user")
+        for client in clients:
+            client.stop()
+        for thread in threads:
+            thread.join()
+
+
 def main() -> None:
-    """Main entry point for the IMAP IDLE client."""
+    """Main entry point for the IMAP IDLE client.
+    
+    EMAIL_FOLDER may list several comma-separated folders, which are watched concurrently.
+    """
     try:
-        client = IMAPIdleClient()
-        client.run()
+        folders = [folder.strip() for folder in EMAIL_FOLDER.split(',') if folder.strip()]
+        clients = [IMAPIdleClient(folder) for folder in folders or ['INBOX']]
+        if len(clients) == 1:
+            clients[0].run()
+        else:
+            run_concurrently(clients)
     except KeyboardInterrupt:
         logger.info("Shutdown requested by user")
     except Exception as e:
-        logger.critical(f"Fatal error: {e}")
-        logger.debug(traceback.format_exc())
+        logger.critical("Fatal error: {}", e)
+        logger.opt(exception=True).debug("Fatal error")
         return 1  # Non-zero exit code on error
     return 0
 
@@ -254,6 +680,6 @@ if __name__ == "__main__":
     try:
         sys.exit(main())
     except Exception as e:
-        logger.critical(f"Unhandled exception: {e}")
-        logger.debug(traceback.format_exc())
+        logger.critical("Unhandled exception: {}", e)
+        logger.opt(exception=True).debug("Unhandled exception")
         sys.exit(1)